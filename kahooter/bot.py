@@ -1,17 +1,63 @@
-from selenium.common.exceptions import (
-    ElementClickInterceptedException,
-    TimeoutException,
-)
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
+from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver import Chrome
 
 from typing import Callable
 import threading
 import enum
 
 
+ROUND_TIMEOUT_SECONDS = 120
+
+STATE_GAME_OVER = 1
+STATE_RANKING = 2
+STATE_GAME_BLOCK = 4
+ANSWER_COUNT_SHIFT = 3  # the bits above the URL flags hold the answer button count
+
+PAGE_STATE_SCRIPT = (
+    "var url = location.href;"
+    " var answerCount = document.querySelectorAll("
+    "\"button[data-functional-selector^='answer-']\").length;"
+    " return (url.indexOf('gameover') >= 0 ? 1 : 0)"
+    " | (url.indexOf('ranking') >= 0 ? 2 : 0)"
+    " | (url.indexOf('gameblock') >= 0 ? 4 : 0)"
+    " | (answerCount << 3);"
+)
+
+# react ignores a plain value assignment, so go through the native setter and fire an input event
+JOIN_LOBBY_SCRIPT = (
+    "var input = document.getElementById('game-input');"
+    " var button = document.querySelector("
+    "'button[data-functional-selector=\"join-game-pin\"]');"
+    " if (input == null || button == null) return false;"
+    " Object.getOwnPropertyDescriptor("
+    "window.HTMLInputElement.prototype, 'value').set.call(input, arguments[0]);"
+    " input.dispatchEvent(new Event('input', {bubbles: true}));"
+    " button.click();"
+    " return true;"
+)
+
+SEND_NAME_SCRIPT = (
+    "var input = document.getElementById('nickname');"
+    " var button = document.querySelector("
+    "'button[data-functional-selector=\"join-button-username\"]');"
+    " if (input == null || button == null) return false;"
+    " Object.getOwnPropertyDescriptor("
+    "window.HTMLInputElement.prototype, 'value').set.call(input, arguments[0]);"
+    " input.dispatchEvent(new Event('input', {bubbles: true}));"
+    " button.click();"
+    " return true;"
+)
+
+CLICK_ANSWER_SCRIPT = (
+    "var button = document.querySelector("
+    "'button[data-functional-selector=\"answer-' + arguments[0] + '\"]');"
+    " if (button != null) button.click();"
+)
+
+
 class SendNameStatus(enum.Enum):
     success = 0
     already_exists = 1
@@ -24,11 +70,11 @@ class Bot(threading.Thread):
         index: int,
         lobby_id: int,
         username: str,
-        driver: Chrome,
+        driver: WebDriver,
         vote_function: Callable[[int], int],
         request_new_name_function: Callable[[], str],
     ) -> None:
-        super().__init__(name=f"Bot-{index}")
+        super().__init__(name=f"Bot-{index}", daemon=True)
 
         self.index = index
         self.lobby_id = lobby_id
@@ -40,6 +86,9 @@ class Bot(threading.Thread):
         self.preparing = False
         self.voting = False
 
+        self._last_state = 0
+        self._waiters: dict[float, WebDriverWait] = {}
+
     def prepare(self) -> bool:
         self.preparing = True
 
@@ -74,23 +123,12 @@ class Bot(threading.Thread):
         self.driver.get("https://kahoot.it")
 
     def join_lobby(self) -> None:
-        self.waiter(5).until(
-            EC.presence_of_element_located((By.ID, "game-input"))
-        ).send_keys(str(self.lobby_id))
-        self.driver.find_element(
-            By.CSS_SELECTOR, 'button[data-functional-selector="join-game-pin"]'
-        ).click()
+        self.waiter(5).until(EC.presence_of_element_located((By.ID, "game-input")))
+        self.driver.execute_script(JOIN_LOBBY_SCRIPT, str(self.lobby_id))
 
     def send_name(self) -> SendNameStatus:
-        self.waiter(3).until(
-            EC.presence_of_element_located((By.ID, "nickname"))
-        ).send_keys(self.username)
-        try:
-            self.driver.find_element(
-                By.CSS_SELECTOR,
-                'button[data-functional-selector="join-button-username"]',
-            ).click()
-        except ElementClickInterceptedException:
+        self.waiter(3).until(EC.presence_of_element_located((By.ID, "nickname")))
+        if not self.driver.execute_script(SEND_NAME_SCRIPT, self.username):
             return SendNameStatus.other_error
 
         try:
@@ -100,37 +138,43 @@ class Bot(threading.Thread):
         return SendNameStatus.success
 
     def vote(self) -> None:
-        while not self.check_game_over():
-            try:
-                answer_buttons = self.waiter(0.5).until(
-                    EC.presence_of_all_elements_located(
-                        (By.CSS_SELECTOR, "button[data-functional-selector^='answer-']")
-                    )
-                )
-                break
-            except TimeoutException:
-                continue
-        if self.check_game_over():
+        def answer_count_or_game_over(_: WebDriver) -> int | str | None:
+            state = self._page_state()
+            if state & (STATE_GAME_OVER | STATE_RANKING):
+                return "game_over"
+            return (state >> ANSWER_COUNT_SHIFT) or None
+
+        try:
+            answer_count = self.waiter(ROUND_TIMEOUT_SECONDS).until(
+                answer_count_or_game_over
+            )
+        except TimeoutException:
+            return
+        if answer_count == "game_over":
             return
 
-        vote_index = self.vote_function(len(answer_buttons))
-        for answer_button in answer_buttons:
-            if (
-                answer_button.get_attribute("data-functional-selector")
-                == f"answer-{vote_index}"
-            ):
-                answer_button.click()
-                break
+        vote_index = self.vote_function(answer_count)
+        self.driver.execute_script(CLICK_ANSWER_SCRIPT, vote_index)
 
     def wait_for_new_round(self) -> None:
-        while not self.check_game_over() and "gameblock" not in self.driver.current_url:
-            self.driver.implicitly_wait(0.5)
+        try:
+            self.waiter(ROUND_TIMEOUT_SECONDS).until(
+                lambda _: self._page_state()
+                & (STATE_GAME_OVER | STATE_RANKING | STATE_GAME_BLOCK)
+            )
+        except TimeoutException:
+            pass
 
     def check_game_over(self) -> bool:
-        return (
-            "gameover" in self.driver.current_url
-            or "ranking" in self.driver.current_url
-        )
+        return bool(self._last_state & (STATE_GAME_OVER | STATE_RANKING))
+
+    def _page_state(self) -> int:
+        self._last_state = self.driver.execute_script(PAGE_STATE_SCRIPT)
+        return self._last_state
 
     def waiter(self, seconds: float) -> WebDriverWait:
-        return WebDriverWait(self.driver, seconds)
+        if seconds not in self._waiters:
+            self._waiters[seconds] = WebDriverWait(
+                self.driver, seconds, poll_frequency=0.2
+            )
+        return self._waiters[seconds]
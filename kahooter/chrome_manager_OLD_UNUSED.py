@@ -1,4 +1,6 @@
 from typing import TypedDict, Literal, Final, Any
+import concurrent.futures
+import functools
 import threading
 import platform
 import requests
@@ -7,11 +9,29 @@ import logging
 import struct
 import shutil
 import json
+import time
 import copy
 import sys
 import re
 import os
 
+try:  # considerably faster than the stdlib json at decoding the large versions feed
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads_json(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_json(data: Any, *, indent: bool = False) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+    return json.dumps(data, indent=2 if indent else None)
+
 
 class ProgressDict(TypedDict):
     download: list[int]
@@ -23,6 +43,19 @@ DEFAULT_PROGRESS_JSON: Final[ProgressDict] = {
     "extract": [False, False, False],
 }
 
+DOWNLOAD_SEGMENT_COUNT = 8
+EXTRACT_THREAD_COUNT = 4
+VERSIONS_CACHE_TTL = 60 * 60 * 24  # one day
+VERSIONS_CACHE_PATH = os.path.join(".portable_chrome", "versions_cache.json")
+
+# one shared pool so the downloader threads reuse connections instead of
+# paying a TCP + TLS handshake per request
+DOWNLOAD_SESSION = requests.Session()
+DOWNLOAD_SESSION.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(pool_maxsize=DOWNLOAD_SEGMENT_COUNT * 3),
+)
+
 
 def check_progress_dict(progress_dict: dict[Any, Any]) -> bool:
     try:
@@ -52,7 +85,7 @@ def load_progress(path: str) -> ProgressDict:
         return copy.copy(DEFAULT_PROGRESS_JSON)
 
     with open(path, "r") as progress_fd:
-        progress = json.load(progress_fd)
+        progress = loads_json(progress_fd.read())
 
     if not check_progress_dict(progress):
         logging.warning("There was an error loading the progress file.")
@@ -63,7 +96,7 @@ def load_progress(path: str) -> ProgressDict:
 
 def write_progress(path: str, progress: ProgressDict) -> None:
     with open(path, "w") as progress_fd:
-        json.dump(progress, progress_fd, indent=4)
+        progress_fd.write(dumps_json(progress, indent=True))
 
 
 def create_portable_chrome_directory() -> tuple[str, bool]:
@@ -73,6 +106,7 @@ def create_portable_chrome_directory() -> tuple[str, bool]:
     return os.path.abspath(".portable_chrome"), True
 
 
+@functools.lru_cache(maxsize=None)  # invariant for the lifetime of the process
 def get_platform() -> Literal["win32", "win64", "mac-arm64", "mac-x64", "linux64"]:
     bits = struct.calcsize("P") * 8
     is_arm = platform.machine()
@@ -98,6 +132,31 @@ def get_newest_version() -> str:
     return get_latest_download_links()[0]
 
 
+@functools.lru_cache(maxsize=1)
+def get_known_good_versions() -> dict[str, Any]:
+    try:
+        if time.time() - os.path.getmtime(VERSIONS_CACHE_PATH) < VERSIONS_CACHE_TTL:
+            with open(VERSIONS_CACHE_PATH, "rb") as cache_fd:
+                return loads_json(cache_fd.read())
+    except (OSError, ValueError):
+        pass
+
+    json_response = loads_json(
+        DOWNLOAD_SESSION.get(
+            "https://googlechromelabs.github.io/chrome-for-testing/known-good-versions-with-downloads.json"
+        ).content
+    )
+
+    try:
+        os.makedirs(os.path.dirname(VERSIONS_CACHE_PATH), exist_ok=True)
+        with open(VERSIONS_CACHE_PATH, "w") as cache_fd:
+            cache_fd.write(dumps_json(json_response))
+    except OSError:  # the cache is only an optimization, never fail on it
+        pass
+
+    return json_response
+
+
 def get_latest_download_links(
     target_version: str | None = None,
 ) -> tuple[str, str, str, str]:
@@ -107,18 +166,18 @@ def get_latest_download_links(
                 return platform["url"]
         raise Exception("Unable to find download link for current platform.")
 
-    json_response = requests.get(
-        "https://googlechromelabs.github.io/chrome-for-testing/known-good-versions-with-downloads.json"
-    ).json()
+    json_response = get_known_good_versions()
 
     if target_version:
+        target_pattern = re.compile(
+            target_version.replace(".", "\\.")
+            .replace("*", "[0-9.]*")
+            .replace("?", "[0-9]*")
+        )
         for version in json_response["versions"]:
             try:
-                if version["version"] == target_version or re.match(
-                    target_version.replace(".", "\\.")
-                    .replace("*", "[0-9.]*")
-                    .replace("?", "[0-9]*"),
-                    version["version"],
+                if version["version"] == target_version or target_pattern.match(
+                    version["version"]
                 ):
                     return (
                         version["version"],
@@ -131,49 +190,35 @@ def get_latest_download_links(
             except KeyError:
                 raise Exception("Unable to find target version.")
 
-    versions_index = 0
-    while True:
-        try:
-            latest_version = sorted(
-                json_response["versions"],
-                key=lambda version: version["version"],
-                reverse=True,
-            )[versions_index]
-        except IndexError:
-            raise Exception("Unable to find latest version.")
-        latest_downloads = latest_version["downloads"]
-
+    # sort once, numerically -- string sorting puts "99.x" above "100.x"
+    sorted_versions = sorted(
+        json_response["versions"],
+        key=lambda version: tuple(int(part) for part in version["version"].split(".")),
+        reverse=True,
+    )
+    for latest_version in sorted_versions:
         try:
             return (
                 latest_version["version"],
-                find_download_link(latest_downloads["chrome"]),
-                find_download_link(latest_downloads["chromedriver"]),
-                find_download_link(latest_downloads["chrome-headless-shell"]),
+                find_download_link(latest_version["downloads"]["chrome"]),
+                find_download_link(latest_version["downloads"]["chromedriver"]),
+                find_download_link(
+                    latest_version["downloads"]["chrome-headless-shell"]
+                ),
             )
         except KeyError:
-            versions_index += 1
             continue
 
+    raise Exception("Unable to find latest version.")
+
 
+@functools.lru_cache(maxsize=None)
 def adapt_executable_name(name: str) -> str:
     if os.name == "nt":
         return name + ".exe"
     return name
 
 
-def supports_partial_download(url: str) -> bool:
-    response = requests.head(url)
-    headers = response.headers
-    accept_ranges = headers.get("Accept-Ranges", "none").lower()
-    allow_header = headers.get("Allow", "").lower()
-
-    return response.status_code == 200 and (
-        accept_ranges == "bytes"
-        or "range" in headers.get("Access-Control-Allow-Headers", "").lower()
-        or "partial" in allow_header
-    )
-
-
 class FileDownloader(threading.Thread):
     def __init__(
         self,
@@ -213,28 +258,95 @@ class FileDownloader(threading.Thread):
             return
         elif self.progress["download"][self.index] == 1:
             logging.debug(f"Continuing downloading zip file ({self.zip_name}).")
+            offset = os.stat(self.zip_filepath).st_size
         else:
             logging.debug(f"Downloading zip file ({self.zip_name}).")
+            offset = 0
 
-        # prepare headers
-        headers = None
-        if self.progress["download"][self.index] == 1:
-            headers = {"Range": f"bytes={os.stat(self.zip_filepath).st_size}-"}
-        elif supports_partial_download(
-            self.url
-        ):  # if it supports partial downloads now it probably will in the future :3
-            self.progress["download"][self.index] = 1
-            write_progress(self.progress_path, self.progress)
-
-        response = requests.get(self.url, headers=headers, stream=True)
+        # the first request doubles as the range support probe: 206 means ranges
+        # work, 200 means the server ignored the header and sent the whole file
+        response = DOWNLOAD_SESSION.get(
+            self.url, headers={"Range": f"bytes={offset}-"}, stream=True
+        )
         response.raw.decode_content = True
         response.raise_for_status()
 
-        # stream file
-        if self.progress["download"][self.index] == 0:
-            mode = "wb"  # truncate file if partial downloads are not supported
+        if response.status_code != 206:
+            self.__stream_response(response, "wb")
+        elif offset > 0:
+            self.__stream_response(response, "ab")
         else:
-            mode = "ab"
+            self.__download_segmented(response)
+
+        self.progress["download"][self.index] = 2
+        write_progress(self.progress_path, self.progress)
+
+    def __download_segmented(self, first_response: requests.Response) -> None:
+        total_size = int(first_response.headers["Content-Range"].rpartition("/")[2])
+        segment_size = -(-total_size // DOWNLOAD_SEGMENT_COUNT)  # ceiling division
+        segments = [
+            (start, min(start + segment_size, total_size) - 1)
+            for start in range(segment_size, total_size, segment_size)
+        ]
+
+        # a partially written segmented file has holes, so it is never marked resumable
+        with open(self.zip_filepath, "wb") as zip_fd:
+            zip_fd.truncate(total_size)
+
+        write_lock = threading.Lock()
+        with open(self.zip_filepath, "r+b") as zip_fd:
+            with concurrent.futures.ThreadPoolExecutor(
+                DOWNLOAD_SEGMENT_COUNT
+            ) as executor:
+                futures = [
+                    executor.submit(self.__download_segment, zip_fd, write_lock, *segment)
+                    for segment in segments
+                ]
+
+                # the probe response streams the whole file, take only segment 0 from it
+                offset = 0
+                for chunk in first_response.iter_content(chunk_size=1024 * 1024):
+                    if not chunk:
+                        continue
+                    chunk = chunk[: segment_size - offset]
+                    self.__write_at(zip_fd, write_lock, offset, chunk)
+                    offset += len(chunk)
+                    if offset >= segment_size:
+                        break
+                first_response.close()
+
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+
+    def __download_segment(
+        self,
+        zip_fd,
+        write_lock: threading.Lock,
+        start_offset: int,
+        end_offset: int,
+    ) -> None:
+        response = DOWNLOAD_SESSION.get(
+            self.url, headers={"Range": f"bytes={start_offset}-{end_offset}"}, stream=True
+        )
+        response.raise_for_status()
+
+        offset = start_offset
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
+            if not chunk:
+                continue
+            self.__write_at(zip_fd, write_lock, offset, chunk)
+            offset += len(chunk)
+
+    @staticmethod
+    def __write_at(zip_fd, write_lock: threading.Lock, offset: int, chunk: bytes) -> None:
+        if hasattr(os, "pwrite"):  # positional writes need no locking on unix
+            os.pwrite(zip_fd.fileno(), chunk, offset)
+        else:
+            with write_lock:
+                zip_fd.seek(offset)
+                zip_fd.write(chunk)
+
+    def __stream_response(self, response: requests.Response, mode: str) -> None:
         with open(self.zip_filepath, mode) as zip_fd:
             for chunk in response.iter_content(
                 chunk_size=1024 * 1024
@@ -242,9 +354,6 @@ class FileDownloader(threading.Thread):
                 if chunk:
                     zip_fd.write(chunk)
 
-            self.progress["download"][self.index] = 2
-            write_progress(self.progress_path, self.progress)
-
     def __extract_zip_files(self) -> None:
         logging.debug(f"Extracting zip file {self.zip_name}.")
 
@@ -254,18 +363,48 @@ class FileDownloader(threading.Thread):
         with zipfile.ZipFile(self.zip_filepath, "r") as zip_ref:
             zip_infolist = zip_ref.infolist()
 
-            for file_index, file in enumerate(zip_ref.namelist()):
-                if os.path.exists(file):
-                    if (
-                        os.stat(os.path.join(self.target_path, file)).st_size
-                        == zip_infolist[file_index].file_size
-                    ):
-                        continue
-                    os.remove(os.path.join(self.target_path, file))
-                zip_ref.extract(file, self.target_path)
-
-            self.progress["extract"][self.index] = True
-            write_progress(self.progress_path, self.progress)
+        # check which members are already on disk once up front instead of per file
+        up_to_date = set()
+        for zip_info in zip_infolist:
+            target = os.path.join(self.target_path, zip_info.filename)
+            if (
+                not zip_info.is_dir()
+                and os.path.isfile(target)
+                and os.path.getsize(target) == zip_info.file_size
+            ):
+                up_to_date.add(zip_info.filename)
+
+        remaining = [
+            zip_info.filename
+            for zip_info in zip_infolist
+            if zip_info.filename not in up_to_date
+        ]
+        shards = [remaining[i::EXTRACT_THREAD_COUNT] for i in range(EXTRACT_THREAD_COUNT)]
+        with concurrent.futures.ThreadPoolExecutor(EXTRACT_THREAD_COUNT) as executor:
+            futures = [
+                executor.submit(self.__extract_members, shard)
+                for shard in shards
+                if shard
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+
+        self.progress["extract"][self.index] = True
+        write_progress(self.progress_path, self.progress)
+
+    def __extract_members(self, member_names: list[str]) -> None:
+        # each thread holds its own handle, ZipFile does not support concurrent reads on one
+        with zipfile.ZipFile(self.zip_filepath, "r") as zip_ref:
+            for member_name in member_names:
+                target = os.path.join(self.target_path, member_name)
+                if member_name.endswith("/"):
+                    os.makedirs(target, exist_ok=True)
+                    continue
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with zip_ref.open(member_name) as member_fd:
+                    with open(target, "wb") as target_fd:
+                        shutil.copyfileobj(member_fd, target_fd, 1024 * 1024)
 
     def __rename_directories(self) -> None:
         logging.debug(f"Renaming directory {self.zip_directory_name}.")
@@ -1,4 +1,5 @@
 from typing import Literal
+import functools
 import cachetools
 import subprocess
 import platform
@@ -65,7 +66,7 @@ def create_portable_chrome_directory() -> tuple[str, bool]:
     return os.path.abspath(".portable_chrome"), True
 
 
-@cachetools.cached({})
+@cachetools.cached(cachetools.TTLCache(maxsize=8, ttl=60 * 60 * 24))
 def get_chromedriver_link(version: str) -> str:
     version_without_patch = ".".join(version.split(".")[:-1])
 
@@ -82,6 +83,7 @@ def get_chromedriver_link(version: str) -> str:
     raise Exception("Unable to get chromedriver link.")
 
 
+@functools.lru_cache(maxsize=None)  # invariant for the lifetime of the process
 def get_platform() -> Literal["win32", "win64", "mac-arm64", "mac-x64", "linux64"]:
     bits = struct.calcsize("P") * 8
     is_arm = platform.machine()
@@ -109,6 +111,7 @@ def get_chromedriver_size(version: str) -> int:
     return int(requests.head(chromedriver_link).headers["Content-Length"])
 
 
+@functools.lru_cache(maxsize=None)
 def adapt_executable_name(name: str) -> str:
     if os.name == "nt":
         return f"{name}.exe"
@@ -123,9 +126,11 @@ def should_download(directory: str, version: str | None = None) -> bool:
     if version == None:
         version = get_chrome_version()
 
-    return get_chromedriver_size(version) != os.path.getsize(
-        get_executable_path(directory, version)
-    )
+    executable_path = get_executable_path(directory, version)
+    if not os.path.isfile(executable_path):  # no point asking the server for the size
+        return True
+
+    return get_chromedriver_size(version) != os.path.getsize(executable_path)
 
 
 def install(directory: str, re_download: bool) -> tuple[str, str]:
@@ -135,10 +140,9 @@ def install(directory: str, re_download: bool) -> tuple[str, str]:
         raise Exception("Unable to get chromedriver link.")
 
     zip_path = os.path.join(directory, f"{version}.zip")
-    relative_zip_executable_path = os.path.join(
-        f"chromedriver-{get_platform()}", adapt_executable_name("chromedriver")
+    zip_executable_name = (
+        f"chromedriver-{get_platform()}/{adapt_executable_name('chromedriver')}"
     )
-    after_unzip_executable_path = os.path.join(directory, relative_zip_executable_path)
     executable_path = os.path.join(directory, adapt_executable_name(version))
 
     if not should_download(directory, version) and not re_download:
@@ -151,12 +155,14 @@ def install(directory: str, re_download: bool) -> tuple[str, str]:
         ):  # download in 1 mb chunks
             chromedriver_fd.write(chunk)
 
+    # copy the single member straight to its final path, skipping the
+    # intermediate directory plus the move and rmdir afterwards
     with zipfile.ZipFile(zip_path, "r") as zip_reference:
-        zip_reference.extract(relative_zip_executable_path, path=directory)
+        with zip_reference.open(zip_executable_name) as member_fd:
+            with open(executable_path, "wb") as executable_fd:
+                shutil.copyfileobj(member_fd, executable_fd, 1024 * 1024)
     os.remove(zip_path)
 
-    shutil.move(after_unzip_executable_path, executable_path)
-    os.rmdir(os.path.dirname(after_unzip_executable_path))
     if os.name == "posix":
         os.chmod(executable_path, os.stat(executable_path).st_mode | 0o111)
 
@@ -1,6 +1,10 @@
+import threading
 import logging
 
 
+FLUSH_INTERVAL = 0.1
+
+
 def create_colored_logger(
     name: str,
     level: int,
@@ -28,18 +32,34 @@ class ColoredStreamHandler(logging.StreamHandler):
 
     RESET_COLOR = "\x1b[0m"
 
-    def format_message(self, record: logging.LogRecord) -> str:
-        color = self.COLORS.get(record.levelno, self.COLORS[logging.INFO])
-
-        message = self.format(record)
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
 
-        return f"{color}{message}{self.RESET_COLOR}"
+        self._templates = {
+            level: f"{color}%s{self.RESET_COLOR}\n"
+            for level, color in self.COLORS.items()
+        }
+        # a tty is line buffered already; for files and pipes flush on a timer
+        # instead of paying a syscall per record
+        if not self.stream.isatty():
+            self.__start_flush_timer()
 
     def emit(self, record: logging.LogRecord) -> None:
         try:
-            msg = self.format_message(record)
-            stream = self.stream
-            stream.write(msg + "\n")
-            stream.flush()
+            template = self._templates.get(
+                record.levelno, self._templates[logging.INFO]
+            )
+            self.stream.write(template % self.format(record))
         except Exception:
             self.handleError(record)
+
+    def __start_flush_timer(self) -> None:
+        timer = threading.Timer(FLUSH_INTERVAL, self.__periodic_flush)
+        timer.daemon = True
+        timer.start()
+
+    def __periodic_flush(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.__start_flush_timer()
@@ -1,21 +1,93 @@
+from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver import Chrome
+from selenium.webdriver import Remote
 
-import multiprocessing.pool
+import concurrent.futures
+import itertools
+import tempfile
 import logging
 import random
+import shutil
+import json
 import sys
 import os
 
 from chromedriver_manager import (
     should_download as should_download_chromedriver,
     get_executable_path as get_chromedriver_path,
+    get_chrome_version,
     install as install_chromedriver,
 )
 from bot import Bot
 
 
+CHROME_ARGUMENTS: tuple[str, ...] = (
+    "--disable-extensions",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--no-first-run",
+    "--log-level=3",
+    "--silent",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-popup-blocking",
+    "--dns-prefetch-disable",
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-infobars",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-notifications",
+    "--disable-breakpad",
+    "--disable-client-side-phishing-detection",
+    # chrome only honors one --disable-features flag, so everything goes in it
+    "--disable-features=Translate,BackForwardCache,InterestCohortAPI,BackgroundSync"
+    ",AudioServiceOutOfProcess,MediaRouter,OptimizationHints,OptimizationHintsFetching",
+    "--disable-ipc-flooding-protection",
+    "--disable-renderer-backgrounding",
+    "--enable-low-end-device-mode",
+    "--disk-cache-size=0",
+    "--media-cache-size=0",
+    "--no-zygote",
+    "--blink-settings=imagesEnabled=false",
+    "--disable-web-resources",
+    "--disable-remote-fonts",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+)
+
+# the session type cannot change while we run, so decide the ozone flag once
+OZONE_ARGUMENT: str | None = None
+if sys.platform == "linux":
+    if os.environ.get("XDG_SESSION_TYPE") == "wayland":
+        OZONE_ARGUMENT = "--ozone-platform=wayland"
+    elif os.environ.get("XDG_SESSION_TYPE") == "x11":
+        OZONE_ARGUMENT = "--ozone-platform=x11"
+
+# assets the bots never need to look at; chrome has no launch flag for this,
+# so it still has to go through one CDP call per driver
+BLOCKED_URL_PATTERNS: tuple[str, ...] = (
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.webp",
+    "*.gif",
+    "*.bmp",
+    "*.tiff",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.mp3",
+    "*.mp4",
+    "*.css",
+)
+
+
 class BotManager:
     def __init__(
         self,
@@ -33,45 +105,99 @@ class BotManager:
         self.do_not_optimize = do_not_optimize
 
         try:
-            if should_download_chromedriver(".chromedriver") or re_download:
-                self.logger.info("Downloading chromedriver.")
-            self.chrome_version, self.chromedriver_path = install_chromedriver(
-                ".chromedriver", re_download
+            self.chrome_version, self.chromedriver_path = self.__resolve_chromedriver(
+                re_download
             )
         except Exception as error:
             self.logger.critical(f"Failed to download chromedriver: {error}")
             return
 
-        self.generated_usernames: list[str] = []
+        # one chromedriver process serves every bot: a session per bot instead
+        # of a driver process (and its port and watchdog) per bot
+        self._service = ChromeService(
+            get_chromedriver_path(".chromedriver", self.chrome_version)
+        )
+        self._service.start()
+
+        # every user0000..user9999 name exactly once, in random order, so a new
+        # name is a pool index instead of rejection sampling against a list
+        self.__username_pool = random.sample(range(10000), 10000)
+        self.__username_counter = itertools.count()
+        self.__profile_directories: list[str] = []
         self.bots: list[Bot] = []
 
+    def __resolve_chromedriver(self, re_download: bool) -> tuple[str, str]:
+        manifest_path = os.path.join(".chromedriver", "manifest.json")
+
+        # a manifest from an earlier run means the version and size probes can
+        # be skipped entirely; it only has to match the locally installed chrome
+        if not re_download:
+            try:
+                with open(manifest_path, "r") as manifest_fd:
+                    manifest = json.load(manifest_fd)
+                if manifest["version"] == get_chrome_version() and os.path.isfile(
+                    manifest["path"]
+                ):
+                    return manifest["version"], manifest["path"]
+            except (OSError, json.JSONDecodeError, KeyError):
+                pass
+
+        if should_download_chromedriver(".chromedriver") or re_download:
+            self.logger.info("Downloading chromedriver.")
+        version, path = install_chromedriver(".chromedriver", re_download)
+
+        with open(manifest_path, "w") as manifest_fd:
+            json.dump({"version": version, "path": path}, manifest_fd)
+
+        return version, path
+
     def run(self) -> None:
-        self.logger.info(f"Creating {self.bot_count} bots.")
-        with multiprocessing.pool.ThreadPool(self.bot_count) as pool:
-            self.bots = pool.map(self.__create_bot, range(self.bot_count))
+        self.logger.info(f"Creating {self.bot_count} bots and joining the lobby.")
+        # pipeline the two stages: the moment a bot's driver is up it starts
+        # joining, instead of every join waiting behind the slowest driver launch
+        setup_workers = min(self.bot_count, (os.cpu_count() or 1) * 4)
+        with concurrent.futures.ThreadPoolExecutor(setup_workers) as executor:
+            creation_futures = [
+                executor.submit(self.__create_bot, index)
+                for index in range(self.bot_count)
+            ]
+            prepare_futures = []
+            for creation_future in concurrent.futures.as_completed(creation_futures):
+                bot = creation_future.result()
+                self.bots.append(bot)
+                prepare_futures.append(executor.submit(bot.prepare))
+            prepare_results = [future.result() for future in prepare_futures]
         self.bots.sort(key=lambda bot: bot.index)
 
-        self.logger.info("Joining lobby with all bots.")
-        with multiprocessing.pool.ThreadPool(len(self.bots)) as pool:
-            prepare_results = pool.map(lambda bot: bot.prepare(), self.bots)
-            if not any(prepare_results):
-                self.logger.critical("All bots failed to join the lobby, exiting.")
-                self.cleanup()
-                return
-            if not all(prepare_results):
-                self.logger.error(
-                    f"Not all bots were able to join the lobby, continuing with {prepare_results.count(True)}/{len(prepare_results)} bots."
-                )
+        successes = sum(prepare_results)
+        if successes == 0:
+            self.logger.critical("All bots failed to join the lobby, exiting.")
+            self.cleanup()
+            return
+        if successes != len(prepare_results):
+            self.logger.error(
+                f"Not all bots were able to join the lobby, continuing with {successes}/{len(prepare_results)} bots."
+            )
 
         self.logger.info("Now voting.")
-        for bot in self.bots:
-            bot.start()
-            self.logger.debug(f"Bot {bot.name} ({bot.username}) started voting.")
+        log_debug = self.logger.isEnabledFor(logging.DEBUG)
+        # resolve the bound methods once instead of a descriptor lookup per call
+        bot_starts = [bot.start for bot in self.bots]
+        bot_joins = [bot.join for bot in self.bots]
+        for bot, start in zip(self.bots, bot_starts):
+            start()
+            if log_debug:
+                self.logger.debug(
+                    "Bot %s (%s) started voting.", bot.name, bot.username
+                )
 
         try:
-            for bot in self.bots:
-                bot.join()
-                self.logger.debug(f"Bot {bot.name} ({bot.username}) finished voting.")
+            for bot, join in zip(self.bots, bot_joins):
+                join()
+                if log_debug:
+                    self.logger.debug(
+                        "Bot %s (%s) finished voting.", bot.name, bot.username
+                    )
         except KeyboardInterrupt:
             self.logger.info("Stopping bots.")
         else:
@@ -80,97 +206,58 @@ class BotManager:
         self.cleanup()
 
     def cleanup(self) -> None:
-        for bot in self.bots:
-            self.logger.debug(f"Stopping {bot.name} ({bot.username}).")
+        if self.bots:  # quits are independent I/O, no reason to wait in line
+            with concurrent.futures.ThreadPoolExecutor(len(self.bots)) as executor:
+                list(executor.map(self.__quit_bot, self.bots))
+
+        self._service.stop()
+
+        for profile_directory in self.__profile_directories:
+            shutil.rmtree(profile_directory, ignore_errors=True)
+
+    def __quit_bot(self, bot: Bot) -> None:
+        self.logger.debug("Stopping %s (%s).", bot.name, bot.username)
+        try:
             bot.driver.quit()
+        except Exception as error:
+            self.logger.warning(f"Could not stop {bot.name} cleanly: {error}")
 
     def __generate_unused_username(self) -> str:
-        while (
-            username := "user" + str(random.randint(0, 9999)).rjust(4, "0")
-        ) in self.generated_usernames:
-            pass
-
-        self.generated_usernames.append(username)
-        return username
+        return f"user{self.__username_pool[next(self.__username_counter)]:04d}"
 
-    def __create_driver(self) -> Chrome:
+    def __create_driver(self, index: int) -> Remote:
         self.logger.debug("Creating driver.")
 
         options = ChromeOptions()
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--no-first-run")
-        options.add_argument("--log-level=3")
-        options.add_argument("--silent")
-        options.add_argument("--disable-background-networking")
-        options.add_argument("--disable-default-apps")
-        options.add_argument("--disable-sync")
-        options.add_argument("--disable-translate")
-        options.add_argument("--disable-popup-blocking")
-        options.add_argument("--disable-features=BackgroundSync")
-        options.add_argument("--dns-prefetch-disable")
-        options.add_argument("--disable-background-timer-throttling")
-        options.add_argument("--disable-backgrounding-occluded-windows")
-        options.add_argument("--disable-infobars")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_argument("--disable-notifications")
-        options.add_argument("--disable-breakpad")
-        options.add_argument("--disable-client-side-phishing-detection")
-        options.add_argument("--disable-default-apps")
-        options.add_argument(
-            "--disable-features=Translate,BackForwardCache,InterestCohortAPI,BackgroundSync"
-        )
-        options.add_argument("--disable-ipc-flooding-protection")
-        options.add_argument("--disable-renderer-backgrounding")
-        options.add_argument("--enable-low-end-device-mode")
-        options.add_argument("--disk-cache-size=0")
-        options.add_argument("--media-cache-size=0")
-        options.add_argument("--no-zygote")
-        options.add_argument("--blink-settings=imagesEnabled=false")
-        options.add_argument("--disable-web-resources")
-
-        if sys.platform == "linux":
-            if os.environ.get("XDG_SESSION_TYPE") == "wayland":
-                options.add_argument("--ozone-platform=wayland")
-            if os.environ.get("XDG_SESSION_TYPE") == "x11":
-                options.add_argument("--ozone-platform=x11")
-
-        if self.do_not_optimize:
-            options = ChromeOptions()  # reset options
+        if not self.do_not_optimize:
+            for argument in CHROME_ARGUMENTS:
+                options.add_argument(argument)
+
+            # keep profile writes in the temp directory (usually tmpfs on linux)
+            profile_directory = os.path.join(
+                tempfile.gettempdir(), f"kahooter-{os.getpid()}-{index}"
+            )
+            self.__profile_directories.append(profile_directory)
+            options.add_argument(f"--user-data-dir={profile_directory}")
+
+            if OZONE_ARGUMENT is not None:
+                options.add_argument(OZONE_ARGUMENT)
 
         if self.headless:
             options.add_argument("--headless=new")
 
-        service = ChromeService(
-            get_chromedriver_path(".chromedriver", self.chrome_version)
+        driver = Remote(
+            command_executor=ChromiumRemoteConnection(
+                self._service.service_url, "goog", "chrome"
+            ),
+            options=options,
         )
-        driver = Chrome(options=options, service=service)
+        driver.implicitly_wait(0)  # only ever wait explicitly
 
         if self.headless:
             try:
                 driver.execute_cdp_cmd(
-                    "Network.setBlockedURLs",
-                    {
-                        "urls": [
-                            "*.png",
-                            "*.jpg",
-                            "*.jpeg",
-                            "*.webp",
-                            "*.gif",
-                            "*.bmp",
-                            "*.tiff",
-                            "*.svg",
-                            "*.ico",
-                            "*.woff",
-                            "*.woff2",
-                            "*.ttf",
-                            "*.otf",
-                            "*.mp3",
-                            "*.mp4",
-                            "*.css",
-                        ]
-                    },
+                    "Network.setBlockedURLs", {"urls": list(BLOCKED_URL_PATTERNS)}
                 )
                 driver.execute_cdp_cmd("Network.enable", {})
             except Exception as error:
@@ -181,12 +268,14 @@ class BotManager:
         return driver
 
     def __create_bot(self, index: int) -> Bot:
-        self.logger.debug(f"Creating bot {index}.")
+        self.logger.debug("Creating bot %d.", index)
         return Bot(
             index,
             self.lobby_id,
             self.__generate_unused_username(),
-            self.__create_driver(),
-            lambda answers_count: random.randint(0, answers_count - 1),
+            self.__create_driver(index),
+            # a private Random per bot, the module-level one is a single lock
+            # every voting thread would contend on
+            random.Random().randrange,
             self.__generate_unused_username,
         )